@@ -1,49 +1,66 @@
 from __future__ import annotations
 
-import asyncio
 import logging
+from typing import Iterable, Iterator
 
 from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 
 from tg_ml_scraper.config import Settings
 from tg_ml_scraper.db import ensure_db
-from tg_ml_scraper.reporting import get_top_posts
+from tg_ml_scraper.reporting import TopPost, get_top_posts
 from tg_ml_scraper.service import TelegramChannelScraper
 
 
 logger = logging.getLogger(__name__)
 
 
-def _split_text(text: str, *, limit: int = 3900) -> list[str]:
-    chunks: list[str] = []
+def _split_text_iter(lines: Iterable[str], *, limit: int = 3900) -> Iterator[str]:
     current: list[str] = []
     current_len = 0
 
-    for line in text.splitlines():
+    for line in lines:
         extra = len(line) + 1
         if current and current_len + extra > limit:
-            chunks.append("\n".join(current))
-            current = [line]
-            current_len = extra
-        else:
-            current.append(line)
-            current_len += extra
+            yield "\n".join(current)
+            current = []
+            current_len = 0
+        current.append(line)
+        current_len += extra
 
     if current:
-        chunks.append("\n".join(current))
-    return chunks
+        yield "\n".join(current)
+
+
+def _format_post_lines(post: TopPost, idx: int) -> Iterator[str]:
+    yield (
+        f"{idx}. {post.channel_title} #{post.message_id} | "
+        f"реакции={post.latest_reactions} прирост={post.reactions_growth}"
+    )
+    yield f"дата: {post.post_datetime}"
+    if post.post_url:
+        yield f"пост: {post.post_url}"
+    for url in post.research_links:
+        yield f"исследование: {url}"
+    for url in post.article_links:
+        yield f"статья: {url}"
+    for url in post.github_links:
+        yield f"github: {url}"
+
+
+def _format_top_lines(top_posts: list[TopPost], lookback_days: int) -> Iterator[str]:
+    yield f"Топ постов за {lookback_days} дн.:"
+    for idx, post in enumerate(top_posts, start=1):
+        yield ""
+        yield from _format_post_lines(post, idx)
 
 
 def _parse_int_args(command: CommandObject | None) -> list[int]:
     if not command or not command.args:
         return []
-
-    values: list[int] = []
-    for token in command.args.split():
-        values.append(int(token))
-    return values
+    return list(map(int, command.args.split()))
 
 
 class TelegramScraperBot:
@@ -54,7 +71,7 @@ class TelegramScraperBot:
         self.settings = settings
         self.router = Router()
         self.scraper = TelegramChannelScraper(settings)
-        self.scrape_lock = asyncio.Lock()
+        self._scraping = False
         ensure_db(self.settings.db_path)
         self._register_handlers()
 
@@ -76,11 +93,12 @@ class TelegramScraperBot:
                 await message.answer("Формат команды: /scrape [days]")
                 return
 
-            if self.scrape_lock.locked():
+            if self._scraping:
                 await message.answer("сбор азпущен")
                 return
 
-            async with self.scrape_lock:
+            self._scraping = True
+            try:
                 await message.answer(f"Запустил сбор. Окно: {lookback_days} дн.")
                 stats = await self.scraper.scrape_lookback(lookback_days=lookback_days)
                 await message.answer(
@@ -89,6 +107,8 @@ class TelegramScraperBot:
                     f"Каналов с ошибками: {stats.channels_failed}\n"
                     f"Обработано постов: {stats.posts_processed}"
                 )
+            finally:
+                self._scraping = False
 
         @self.router.message(Command("top"))
         async def top_handler(message: Message, command: CommandObject) -> None:
@@ -99,6 +119,9 @@ class TelegramScraperBot:
             except ValueError:
                 await message.answer("фрмат команды: /top [limit] [days]")
                 return
+            if limit < 1:
+                await message.answer("фрмат команды: /top [limit] [days]")
+                return
 
             top_posts = get_top_posts(
                 self.settings.db_path,
@@ -110,32 +133,11 @@ class TelegramScraperBot:
                 await message.answer("нет данных - запустите  /scrape")
                 return
 
-            lines: list[str] = []
-            lines.append(f"Топ постов за {lookback_days} дн.:")
-            lines.append("")
-
-            for idx, post in enumerate(top_posts, start=1):
-                lines.append(
-                    f"{idx}. {post.channel_title} #{post.message_id} | "
-                    f"реакции={post.latest_reactions} прирост={post.reactions_growth}"
-                )
-                lines.append(f"дата: {post.post_datetime}")
-                if post.post_url:
-                    lines.append(f"пост: {post.post_url}")
-                for url in post.research_links:
-                    lines.append(f"исследование: {url}")
-                for url in post.article_links:
-                    lines.append(f"статья: {url}")
-                for url in post.github_links:
-                    lines.append(f"github: {url}")
-                lines.append("")
-
-            text = "\n".join(lines).strip()
-            for chunk in _split_text(text):
+            for chunk in _split_text_iter(_format_top_lines(top_posts, lookback_days)):
                 await message.answer(chunk)
 
     async def run(self) -> None:
-        bot = Bot(token=self.settings.bot_token)
+        bot = Bot(token=self.settings.bot_token, session=AiohttpSession(timeout=30))
         dispatcher = Dispatcher()
         dispatcher.include_router(self.router)
 
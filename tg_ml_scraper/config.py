@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import os
 from dataclasses import dataclass
 from pathlib import Path
@@ -18,6 +19,7 @@ class Settings:
     schedule_minute: int
     db_path: Path
     bot_token: str | None
+    max_concurrent_channels: int = 4
 
 
 def _parse_channels(raw: str) -> list[str]:
@@ -27,6 +29,7 @@ def _parse_channels(raw: str) -> list[str]:
     return channels
 
 
+@functools.lru_cache(maxsize=1)
 def load_settings() -> Settings:
     load_dotenv()
 
@@ -49,4 +52,5 @@ def load_settings() -> Settings:
         schedule_minute=int(os.getenv("SCHEDULE_MINUTE", "0")),
         db_path=db_path,
         bot_token=(os.getenv("BOT_TOKEN", "").strip() or None),
+        max_concurrent_channels=max(1, int(os.getenv("MAX_CONCURRENT_CHANNELS", "4"))),
     )
@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import atexit
+import hashlib
 import json
 import sqlite3
+import threading
 from contextlib import contextmanager
 from datetime import date
 from pathlib import Path
 from typing import Iterator
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 SCHEMA = """
 PRAGMA foreign_keys = ON;
@@ -42,15 +50,84 @@ CREATE TABLE IF NOT EXISTS snapshots (
     reactions_json TEXT NOT NULL,
     views INTEGER,
     forwards INTEGER,
+    reactions_hash INTEGER,
     UNIQUE(post_id, snapshot_date),
     FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
 );
+
+CREATE INDEX IF NOT EXISTS idx_posts_datetime ON posts(post_datetime);
+CREATE INDEX IF NOT EXISTS idx_snap_post_date_desc
+    ON snapshots(post_id, snapshot_date DESC, total_reactions, views, forwards);
+CREATE INDEX IF NOT EXISTS idx_links_post_type ON links(post_id, link_type);
+CREATE INDEX IF NOT EXISTS idx_links_post ON links(post_id, id);
 """
 
+SQL_UPSERT_POST = """
+INSERT INTO posts (
+    channel_id, channel_username, channel_title, message_id,
+    post_url, post_datetime, message_text, views, forwards
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(channel_id, message_id) DO UPDATE SET
+    channel_username=excluded.channel_username,
+    channel_title=excluded.channel_title,
+    post_url=excluded.post_url,
+    post_datetime=excluded.post_datetime,
+    message_text=excluded.message_text,
+    views=excluded.views,
+    forwards=excluded.forwards
+"""
+
+SQL_UPSERT_SNAPSHOT = """
+INSERT INTO snapshots (
+    post_id, snapshot_date, total_reactions, reactions_json, views, forwards, reactions_hash
+)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(post_id, snapshot_date) DO UPDATE SET
+    total_reactions=excluded.total_reactions,
+    reactions_json=excluded.reactions_json,
+    views=excluded.views,
+    forwards=excluded.forwards,
+    reactions_hash=excluded.reactions_hash
+"""
+
+SQL_INSERT_LINKS = "INSERT OR IGNORE INTO links (post_id, url, link_type) VALUES (?, ?, ?)"
+SQL_DELETE_LINK = "DELETE FROM links WHERE post_id = ? AND url = ?"
+
+# Stay below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds (999).
+SQL_MAX_PARAMS = 900
+
+PostRow = tuple[int, str | None, str, int, str | None, str, str | None, int | None, int | None]
+SnapshotRow = tuple[int, date, int, dict[str, int], int | None, int | None]
+
+CONNECTION_PRAGMAS = (
+    "foreign_keys=ON",
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "busy_timeout=5000",
+    "cache_size=-65536",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+)
+
+_ENSURED: set[Path] = set()
+_POOL: dict[Path, sqlite3.Connection] = {}
+_POOL_LOCK = threading.Lock()
+
+
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma}")
+
 
 def ensure_db(db_path: Path) -> None:
+    key = db_path.resolve()
+    if key in _ENSURED:
+        return
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(db_path) as conn:
+    conn = sqlite3.connect(db_path)
+    try:
+        _apply_pragmas(conn)
         conn.executescript(SCHEMA)
         columns = {
             row[1]
@@ -58,18 +135,75 @@ def ensure_db(db_path: Path) -> None:
         }
         if "post_url" not in columns:
             conn.execute("ALTER TABLE posts ADD COLUMN post_url TEXT")
+        snapshot_columns = {
+            row[1]
+            for row in conn.execute("PRAGMA table_info(snapshots)").fetchall()
+        }
+        if "reactions_hash" not in snapshot_columns:
+            conn.execute("ALTER TABLE snapshots ADD COLUMN reactions_hash INTEGER")
+        conn.execute("PRAGMA analysis_limit=1000")
+        conn.execute("ANALYZE")
         conn.commit()
+    finally:
+        conn.close()
+    _ENSURED.add(key)
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        db_path,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=256,
+    )
+    _apply_pragmas(conn)
+    return conn
 
 
 @contextmanager
 def open_db(db_path: Path) -> Iterator[sqlite3.Connection]:
-    conn = sqlite3.connect(db_path)
+    """Yield the process-wide pooled connection for ``db_path``.
+
+    The connection is shared by every caller for the same path and stays
+    open until interpreter exit, so leaving the block does not close it.
+    ``row_factory`` is reset to ``sqlite3.Row`` on entry. If the block raises
+    while a transaction is open, that transaction is rolled back so it
+    cannot leak to the next user of the connection.
+    """
+    key = db_path.resolve()
+    with _POOL_LOCK:
+        conn = _POOL.get(key)
+        if conn is None:
+            conn = _POOL[key] = _connect(db_path)
+    conn.row_factory = sqlite3.Row
     try:
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
         yield conn
-    finally:
-        conn.close()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+@atexit.register
+def close_pooled_connections() -> None:
+    with _POOL_LOCK:
+        for conn in _POOL.values():
+            conn.close()
+        _POOL.clear()
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    # The pooled connection is shared by concurrent scrape tasks and report
+    # calls, so the body must not await: a transaction may never stay open
+    # across a point where another coroutine can use the connection.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
 
 
 def upsert_post(
@@ -86,21 +220,7 @@ def upsert_post(
     forwards: int | None,
 ) -> int:
     conn.execute(
-        """
-        INSERT INTO posts (
-            channel_id, channel_username, channel_title, message_id,
-            post_url, post_datetime, message_text, views, forwards
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(channel_id, message_id) DO UPDATE SET
-            channel_username=excluded.channel_username,
-            channel_title=excluded.channel_title,
-            post_url=excluded.post_url,
-            post_datetime=excluded.post_datetime,
-            message_text=excluded.message_text,
-            views=excluded.views,
-            forwards=excluded.forwards
-        """,
+        SQL_UPSERT_POST,
         (
             channel_id,
             channel_username,
@@ -123,14 +243,105 @@ def upsert_post(
     return int(row["id"])
 
 
+def upsert_posts_many(conn: sqlite3.Connection, rows: list[PostRow]) -> dict[tuple[int, int], int]:
+    if not rows:
+        return {}
+    conn.executemany(SQL_UPSERT_POST, rows)
+
+    message_ids_by_channel: dict[int, list[int]] = {}
+    for row in rows:
+        message_ids_by_channel.setdefault(row[0], []).append(row[3])
+
+    post_ids: dict[tuple[int, int], int] = {}
+    for channel_id, message_ids in message_ids_by_channel.items():
+        for start in range(0, len(message_ids), SQL_MAX_PARAMS - 1):
+            chunk = message_ids[start:start + SQL_MAX_PARAMS - 1]
+            for row in conn.execute(
+                "SELECT message_id, id FROM posts "
+                f"WHERE channel_id = ? AND message_id IN ({', '.join('?' * len(chunk))})",
+                (channel_id, *chunk),
+            ):
+                post_ids[(channel_id, row[0])] = row[1]
+
+    if any((row[0], row[3]) not in post_ids for row in rows):
+        raise RuntimeError("Failed to resolve post ids after upsert.")
+    return post_ids
+
+
 def replace_links(conn: sqlite3.Connection, post_id: int, links: list[tuple[str, str]]) -> None:
-    conn.execute("DELETE FROM links WHERE post_id = ?", (post_id,))
-    if not links:
+    replace_links_many(conn, {post_id: links})
+
+
+def replace_links_many(
+    conn: sqlite3.Connection,
+    links_by_post: dict[int, list[tuple[str, str]]],
+) -> None:
+    if not links_by_post:
         return
-    conn.executemany(
-        "INSERT OR IGNORE INTO links (post_id, url, link_type) VALUES (?, ?, ?)",
-        [(post_id, url, link_type) for url, link_type in links],
-    )
+    post_ids = list(links_by_post)
+    existing: dict[int, set[tuple[str, str]]] = {}
+    for start in range(0, len(post_ids), SQL_MAX_PARAMS):
+        chunk = post_ids[start:start + SQL_MAX_PARAMS]
+        for row in conn.execute(
+            f"SELECT post_id, url, link_type FROM links WHERE post_id IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        ):
+            existing.setdefault(row[0], set()).add((row[1], row[2]))
+
+    to_remove: list[tuple[int, str]] = []
+    to_add: list[tuple[int, str, str]] = []
+    for post_id, links in links_by_post.items():
+        current = existing.get(post_id, set())
+        to_remove.extend((post_id, url) for url, _ in current.difference(links))
+        to_add.extend(
+            (post_id, url, link_type)
+            for url, link_type in links
+            if (url, link_type) not in current
+        )
+
+    if to_remove:
+        conn.executemany(SQL_DELETE_LINK, to_remove)
+    if to_add:
+        conn.executemany(SQL_INSERT_LINKS, to_add)
+
+
+def _dump_reactions(reactions: dict[str, int]) -> str:
+    if orjson is not None:
+        return orjson.dumps(reactions, option=orjson.OPT_SORT_KEYS).decode()
+    return json.dumps(reactions, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def _snapshot_hash(
+    total_reactions: int,
+    reactions: dict[str, int],
+    views: int | None,
+    forwards: int | None,
+) -> int:
+    # Stable across processes (unlike hash()), so daily runs can compare
+    # against rows written by earlier runs.
+    key = repr((total_reactions, sorted(reactions.items()), views, forwards)).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big", signed=True)
+
+
+def _existing_snapshot_hashes(
+    conn: sqlite3.Connection,
+    keys: list[tuple[int, str]],
+) -> dict[tuple[int, str], int | None]:
+    post_ids_by_day: dict[str, list[int]] = {}
+    for post_id, snapshot_day in keys:
+        post_ids_by_day.setdefault(snapshot_day, []).append(post_id)
+
+    existing: dict[tuple[int, str], int | None] = {}
+    for snapshot_day, post_ids in post_ids_by_day.items():
+        for start in range(0, len(post_ids), SQL_MAX_PARAMS - 1):
+            chunk = post_ids[start:start + SQL_MAX_PARAMS - 1]
+            for row in conn.execute(
+                "SELECT post_id, reactions_hash FROM snapshots "
+                f"WHERE snapshot_date = ? AND post_id IN ({', '.join('?' * len(chunk))})",
+                (snapshot_day, *chunk),
+            ):
+                existing[(row[0], snapshot_day)] = row[1]
+    return existing
 
 
 def upsert_snapshot(
@@ -143,24 +354,32 @@ def upsert_snapshot(
     views: int | None,
     forwards: int | None,
 ) -> None:
-    conn.execute(
-        """
-        INSERT INTO snapshots (
-            post_id, snapshot_date, total_reactions, reactions_json, views, forwards
-        )
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(post_id, snapshot_date) DO UPDATE SET
-            total_reactions=excluded.total_reactions,
-            reactions_json=excluded.reactions_json,
-            views=excluded.views,
-            forwards=excluded.forwards
-        """,
+    upsert_snapshots_many(
+        conn,
+        [(post_id, snapshot_date, total_reactions, reactions, views, forwards)],
+    )
+
+
+def upsert_snapshots_many(conn: sqlite3.Connection, rows: list[SnapshotRow]) -> None:
+    if not rows:
+        return
+    hashed = [
         (
             post_id,
             snapshot_date.isoformat(),
-            total_reactions,
-            json.dumps(reactions, ensure_ascii=True, sort_keys=True),
+            total,
+            reactions,
             views,
             forwards,
-        ),
-    )
+            _snapshot_hash(total, reactions, views, forwards),
+        )
+        for post_id, snapshot_date, total, reactions, views, forwards in rows
+    ]
+    existing = _existing_snapshot_hashes(conn, [(row[0], row[1]) for row in hashed])
+    changed = [
+        (post_id, snapshot_day, total, _dump_reactions(reactions), views, forwards, snapshot_hash)
+        for post_id, snapshot_day, total, reactions, views, forwards, snapshot_hash in hashed
+        if existing.get((post_id, snapshot_day)) != snapshot_hash
+    ]
+    if changed:
+        conn.executemany(SQL_UPSERT_SNAPSHOT, changed)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
+import functools
 import re
-from typing import Iterable
 from urllib.parse import urlparse
 
 from telethon.tl.custom.message import Message
@@ -29,57 +29,75 @@ TELEGRAM_HOST_SUFFIXES = (
     "telegram.dog",
     "telegram.org",
 )
+_RESEARCH_HOSTS = frozenset(RESEARCH_HOST_SUFFIXES)
+_TELEGRAM_HOSTS = frozenset(TELEGRAM_HOST_SUFFIXES)
 
 
-def extract_urls(message: Message) -> list[str]:
-    urls: set[str] = set()
-    text = message.message or ""
-    for match in URL_REGEX.findall(text):
-        urls.add(match.rstrip(".,;:!?"))
-
-    entities = message.entities or []
-    for entity in entities:
-        if isinstance(entity, MessageEntityTextUrl) and entity.url:
-            urls.add(entity.url.strip())
-
-    return sorted(urls)
+def _url_host(url: str) -> str:
+    if url.startswith(("https://", "http://")):
+        return url.split("/", 3)[2].split("?", 1)[0].split("#", 1)[0].lower()
+    return (urlparse(url).netloc or "").lower()
 
 
-def classify_link(url: str) -> str:
-    host = (urlparse(url).netloc or "").lower()
+@functools.lru_cache(maxsize=1024)
+def _classify_host(host: str) -> str:
     if "github.com" in host:
         return "github"
-    for suffix in TELEGRAM_HOST_SUFFIXES:
-        if host == suffix or host.endswith("." + suffix):
+    labels = host.split(".")
+    for i in range(len(labels)):
+        tail = ".".join(labels[i:])
+        if tail in _TELEGRAM_HOSTS:
             return "telegram"
-    for suffix in RESEARCH_HOST_SUFFIXES:
-        if host == suffix or host.endswith("." + suffix):
+        if tail in _RESEARCH_HOSTS:
             return "research"
     if host:
         return "article"
     return "other"
 
 
-def links_with_types(urls: Iterable[str]) -> list[tuple[str, str]]:
-    return [(url, classify_link(url)) for url in urls]
+def classify_link(url: str) -> str:
+    return _classify_host(_url_host(url))
+
+
+def extract_links(message: Message) -> list[tuple[str, str]]:
+    links: dict[str, str] = {}
+    text = message.message or ""
+    for match in URL_REGEX.findall(text):
+        url = match.rstrip(".,;:!?")
+        if url not in links:
+            links[url] = classify_link(url)
+
+    entities = message.entities or []
+    for entity in entities:
+        if isinstance(entity, MessageEntityTextUrl) and entity.url:
+            url = entity.url.strip()
+            if url not in links:
+                links[url] = classify_link(url)
+
+    return sorted(links.items())
+
+
+def extract_urls(message: Message) -> list[str]:
+    return [url for url, _ in extract_links(message)]
 
 
 def extract_reactions(message: Message) -> dict[str, int]:
     results: dict[str, int] = {}
-    reactions = getattr(message, "reactions", None)
-    if not reactions or not getattr(reactions, "results", None):
+    reactions = message.reactions
+    if not reactions or not reactions.results:
         return results
 
     for item in reactions.results:
-        key = "unknown"
-        reaction_obj = getattr(item, "reaction", None)
-        if reaction_obj is not None:
-            emoticon = getattr(reaction_obj, "emoticon", None)
+        reaction_obj = item.reaction
+        try:
+            key = reaction_obj.emoticon
+        except AttributeError:
             document_id = getattr(reaction_obj, "document_id", None)
-            key = emoticon or (f"custom_{document_id}" if document_id else str(reaction_obj))
-        results[key] = int(getattr(item, "count", 0))
+            if document_id:
+                key = f"custom_{document_id}"
+            elif reaction_obj is None:
+                key = "unknown"
+            else:
+                key = str(reaction_obj)
+        results[key] = item.count
     return results
-
-
-def total_reactions(reactions: dict[str, int]) -> int:
-    return sum(reactions.values())
@@ -36,6 +36,13 @@ def _configure_stdout() -> None:
             pass
 
 
+def _positive_int(raw: str) -> int:
+    value = int(raw)
+    if value < 1:
+        raise argparse.ArgumentTypeError("must be >= 1")
+    return value
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Telegram ML/DS channel scraper")
     parser.add_argument("--verbose", action="store_true", help="Enable debug logs")
@@ -54,7 +61,7 @@ def build_parser() -> argparse.ArgumentParser:
     subparsers.add_parser("run-bot", help="Run Telegram bot interface (aiogram)")
 
     report_parser = subparsers.add_parser("report-top", help="Print top posts with github links")
-    report_parser.add_argument("--limit", type=int, default=20, help="Max posts in report")
+    report_parser.add_argument("--limit", type=_positive_int, default=20, help="Max posts in report")
     report_parser.add_argument(
         "--lookback-days",
         type=int,
@@ -68,7 +75,7 @@ def build_parser() -> argparse.ArgumentParser:
     )
 
     export_parser = subparsers.add_parser("export-weekly", help="Export top github-linked posts to files")
-    export_parser.add_argument("--limit", type=int, default=30, help="Max posts in export")
+    export_parser.add_argument("--limit", type=_positive_int, default=30, help="Max posts in export")
     export_parser.add_argument(
         "--lookback-days",
         type=int,
@@ -1,19 +1,32 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import sqlite3
 from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 
 from telethon import TelegramClient
 from telethon.errors import ChannelPrivateError, UsernameInvalidError, UsernameNotOccupiedError
 
 from tg_ml_scraper.config import Settings
-from tg_ml_scraper.db import ensure_db, open_db, replace_links, upsert_post, upsert_snapshot
-from tg_ml_scraper.extractors import extract_reactions, extract_urls, links_with_types, total_reactions
+from tg_ml_scraper.db import (
+    PostRow,
+    SnapshotRow,
+    ensure_db,
+    open_db,
+    replace_links_many,
+    transaction,
+    upsert_posts_many,
+    upsert_snapshots_many,
+)
+from tg_ml_scraper.extractors import extract_links, extract_reactions
 
 
 logger = logging.getLogger(__name__)
 
+FLUSH_EVERY_MESSAGES = 256
+
 
 @dataclass
 class ScrapeStats:
@@ -29,6 +42,37 @@ def _normalize_dt(dt: datetime) -> datetime:
     return dt.astimezone(timezone.utc)
 
 
+def _flush_posts(
+    conn: sqlite3.Connection,
+    post_rows: list[PostRow],
+    post_links: list[list[tuple[str, str]]],
+    post_reactions: list[dict[str, int]],
+    snapshot_day: date,
+) -> None:
+    if not post_rows:
+        return
+    # Synchronous on purpose: see transaction() in db.py.
+    with transaction(conn):
+        post_ids = upsert_posts_many(conn, post_rows)
+        links_by_post: dict[int, list[tuple[str, str]]] = {}
+        snapshot_rows: list[SnapshotRow] = []
+        for row, links, reactions_map in zip(post_rows, post_links, post_reactions):
+            post_id = post_ids[(row[0], row[3])]
+            links_by_post[post_id] = links
+            snapshot_rows.append(
+                (
+                    post_id,
+                    snapshot_day,
+                    sum(reactions_map.values()),
+                    reactions_map,
+                    row[7],
+                    row[8],
+                )
+            )
+        replace_links_many(conn, links_by_post)
+        upsert_snapshots_many(conn, snapshot_rows)
+
+
 class TelegramChannelScraper:
     def __init__(self, settings: Settings) -> None:
         self.settings = settings
@@ -36,8 +80,9 @@ class TelegramChannelScraper:
     async def scrape_lookback(self, lookback_days: int | None = None) -> ScrapeStats:
         ensure_db(self.settings.db_path)
         effective_lookback = lookback_days or self.settings.lookback_days
-        since_dt = datetime.now(timezone.utc) - timedelta(days=effective_lookback)
-        snapshot_day = datetime.now(timezone.utc).date()
+        now_utc = datetime.now(timezone.utc)
+        since_dt = now_utc - timedelta(days=effective_lookback)
+        snapshot_day = now_utc.date()
 
         stats = ScrapeStats(channels_total=len(self.settings.channels))
         client = TelegramClient(
@@ -50,74 +95,109 @@ class TelegramChannelScraper:
 
         try:
             with open_db(self.settings.db_path) as conn:
-                for raw_channel in self.settings.channels:
-                    channel = raw_channel.lstrip("@")
-                    try:
-                        entity = await client.get_entity(channel)
-                    except (UsernameInvalidError, UsernameNotOccupiedError, ChannelPrivateError) as exc:
-                        stats.channels_failed += 1
-                        logger.warning("Skip channel %s: %s", channel, exc)
-                        continue
-                    except Exception as exc:  # noqa: BLE001
-                        stats.channels_failed += 1
-                        logger.exception("Unexpected error in channel %s: %s", channel, exc)
-                        continue
-
-                    channel_title = getattr(entity, "title", channel)
-                    channel_username = getattr(entity, "username", None)
-                    channel_id = int(getattr(entity, "id"))
-                    posts_in_channel = 0
-
-                    async for message in client.iter_messages(entity):
-                        if message.date is None:
-                            continue
-                        msg_dt = _normalize_dt(message.date)
-                        if msg_dt < since_dt:
-                            break
-
-                        urls = extract_urls(message)
-                        reactions_map = extract_reactions(message)
-                        post_url = (
-                            f"https://t.me/{channel_username}/{message.id}"
-                            if channel_username
-                            else None
-                        )
+                semaphore = asyncio.Semaphore(self.settings.max_concurrent_channels)
 
-                        post_id = upsert_post(
-                            conn,
-                            channel_id=channel_id,
-                            channel_username=channel_username,
-                            channel_title=channel_title,
-                            message_id=message.id,
-                            post_url=post_url,
-                            post_datetime=msg_dt.isoformat(),
-                            message_text=message.message,
-                            views=message.views,
-                            forwards=message.forwards,
-                        )
-                        replace_links(conn, post_id, links_with_types(urls))
-                        upsert_snapshot(
+                async def scrape_one(raw_channel: str) -> int | None:
+                    async with semaphore:
+                        return await self._scrape_channel(
+                            client,
                             conn,
-                            post_id=post_id,
-                            snapshot_date=snapshot_day,
-                            total_reactions=total_reactions(reactions_map),
-                            reactions=reactions_map,
-                            views=message.views,
-                            forwards=message.forwards,
+                            raw_channel.lstrip("@"),
+                            since_dt=since_dt,
+                            snapshot_day=snapshot_day,
                         )
-                        posts_in_channel += 1
-
-                    stats.channels_ok += 1
-                    stats.posts_processed += posts_in_channel
-                    logger.info(
-                        "Channel %s (%s): %s posts processed",
-                        channel_title,
-                        channel,
-                        posts_in_channel,
-                    )
-                conn.commit()
+
+                results = await asyncio.gather(
+                    *(scrape_one(raw_channel) for raw_channel in self.settings.channels),
+                    return_exceptions=True,
+                )
         finally:
             await client.disconnect()
 
+        for raw_channel, result in zip(self.settings.channels, results):
+            if isinstance(result, BaseException):
+                stats.channels_failed += 1
+                logger.error(
+                    "Unexpected error in channel %s: %s",
+                    raw_channel.lstrip("@"),
+                    result,
+                    exc_info=result,
+                )
+            elif result is None:
+                stats.channels_failed += 1
+            else:
+                stats.channels_ok += 1
+                stats.posts_processed += result
+
         return stats
 
+    async def _scrape_channel(
+        self,
+        client: TelegramClient,
+        conn: sqlite3.Connection,
+        channel: str,
+        *,
+        since_dt: datetime,
+        snapshot_day: date,
+    ) -> int | None:
+        try:
+            entity = await client.get_entity(channel)
+        except (UsernameInvalidError, UsernameNotOccupiedError, ChannelPrivateError) as exc:
+            logger.warning("Skip channel %s: %s", channel, exc)
+            return None
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Unexpected error in channel %s: %s", channel, exc)
+            return None
+
+        channel_title = getattr(entity, "title", channel)
+        channel_username = getattr(entity, "username", None)
+        channel_id = int(getattr(entity, "id"))
+        posts_in_channel = 0
+
+        post_rows: list[PostRow] = []
+        post_links: list[list[tuple[str, str]]] = []
+        post_reactions: list[dict[str, int]] = []
+
+        post_url_base = f"https://t.me/{channel_username}/" if channel_username else None
+
+        async for message in client.iter_messages(entity):
+            if message.date is None:
+                continue
+            msg_dt = _normalize_dt(message.date)
+            if msg_dt < since_dt:
+                break
+
+            post_url = post_url_base + str(message.id) if post_url_base else None
+
+            post_rows.append(
+                (
+                    channel_id,
+                    channel_username,
+                    channel_title,
+                    message.id,
+                    post_url,
+                    msg_dt.isoformat(),
+                    message.message,
+                    message.views,
+                    message.forwards,
+                )
+            )
+            post_links.append(extract_links(message))
+            post_reactions.append(extract_reactions(message))
+            posts_in_channel += 1
+
+            if len(post_rows) >= FLUSH_EVERY_MESSAGES:
+                _flush_posts(conn, post_rows, post_links, post_reactions, snapshot_day)
+                post_rows.clear()
+                post_links.clear()
+                post_reactions.clear()
+
+        _flush_posts(conn, post_rows, post_links, post_reactions, snapshot_day)
+
+        logger.info(
+            "Channel %s (%s): %s posts processed",
+            channel_title,
+            channel,
+            posts_in_channel,
+        )
+        return posts_in_channel